@@ -4,6 +4,8 @@
 # Copyright (c) 2015-2023 Florent Kermarrec <florent@enjoy-digital.fr>
 # SPDX-License-Identifier: BSD-2-Clause
 
+from functools import lru_cache
+
 from migen import *
 
 from litex.gen import *
@@ -31,6 +33,11 @@ def get_bar_mask(size):
 
 # Layouts ------------------------------------------------------------------------------------------
 
+# The cached factories below return a *shared* EndpointDescription per parameter set: treat it as
+# read-only. In particular, don't pass it to stream.Pack/Unpack, which reassign payload_layout on
+# the description they are given and would corrupt it for every later caller.
+
+@lru_cache(maxsize=None)
 def phy_layout(data_width):
     layout = [
         ("dat", data_width),
@@ -38,6 +45,7 @@ def phy_layout(data_width):
     ]
     return EndpointDescription(layout)
 
+@lru_cache(maxsize=None)
 def configuration_layout(data_width, address_width=32):
     layout = [
         # Request Parameters.
@@ -58,6 +66,7 @@ def configuration_layout(data_width, address_width=32):
     ]
     return EndpointDescription(layout)
 
+@lru_cache(maxsize=None)
 def request_layout(data_width, address_width=32):
     layout = [
         # Request Parameters.
@@ -76,6 +85,7 @@ def request_layout(data_width, address_width=32):
     ]
     return EndpointDescription(layout)
 
+@lru_cache(maxsize=None)
 def completion_layout(data_width, address_width=32):
     layout = [
         # Completion Parameters.
@@ -96,6 +106,7 @@ def completion_layout(data_width, address_width=32):
     ]
     return EndpointDescription(layout)
 
+@lru_cache(maxsize=None)
 def ptm_layout(data_width):
     layout = [
         ("request",       1), # Request.
@@ -117,6 +128,7 @@ def ptm_layout(data_width):
 def msi_layout():
     return [("dat", 8)]
 
+@lru_cache(maxsize=None)
 def dma_layout(data_width):
     layout = [("data", data_width)]
     return EndpointDescription(layout)
@@ -16,6 +16,15 @@ from litepcie.frontend.dma import descriptor_layout, LitePCIeDMAWriter, LitePCIe
 # LitePCIeAXISlave ---------------------------------------------------------------------------------
 
 class LitePCIeAXISlave(LiteXModule):
+    """LitePCIe AXI Slave
+
+    Maps AXI-Full Read/Write accesses to LitePCIe DMA Descriptors executed on the PCIe bus.
+
+    Only the mandatory AXI signals are used: ``addr``/``len``/``id`` on AW/AR, ``data``/``last`` on
+    W and ``data``/``last``/``id``/``resp`` on R/B. The optional ``lock``/``qos``/``region`` (and
+    ``size``/``burst``/``cache``/``prot``) request qualifiers are ignored: bursts are assumed to be
+    full data-width INCR and responses are always OKAY. The unused inputs are pruned at synthesis.
+    """
     def __init__(self, endpoint, data_width=32, id_width=1):
         self.axi = axi.AXIInterface(data_width=data_width, id_width=id_width)
 
@@ -265,7 +265,7 @@ class LitePCIeDMAReader(LiteXModule):
 
     A MSI IRQ can be generated when a descriptor has been executed.
     """
-    def __init__(self, endpoint, port, with_table=True, table_depth=256, address_width=32, data_width=None):
+    def __init__(self, endpoint, port, with_table=True, table_depth=256, address_width=32, data_width=None, fifo_depth=None):
         self.port       = port
         self.data_width = data_width or endpoint.phy.data_width
         # Stream Endpoint.
@@ -317,7 +317,9 @@ class LitePCIeDMAReader(LiteXModule):
         self.comb += self.data_conv.source.connect(self.source)
 
         # Data FIFO --------------------------------------------------------------------------------
-        data_fifo_depth = 4*max_pending_words
+        # Default depth keeps all pending Read Requests in flight (with margin); can be increased to
+        # hide Host round-trip latency on high-latency systems or reduced to save BRAMs.
+        data_fifo_depth = fifo_depth if fifo_depth is not None else 4*max_pending_words
         data_fifo = SyncFIFO(dma_layout(endpoint.phy.data_width), data_fifo_depth, buffered=True)
         self.data_fifo = ResetInserter()(data_fifo)
         self.comb += [
@@ -411,7 +413,7 @@ class LitePCIeDMAWriter(LiteXModule):
 
     A MSI IRQ can be generated when a descriptor has been executed.
     """
-    def __init__(self, endpoint, port, with_table=True, table_depth=256, address_width=32, data_width=None):
+    def __init__(self, endpoint, port, with_table=True, table_depth=256, address_width=32, data_width=None, fifo_depth=None):
         self.port       = port
         self.data_width = data_width or endpoint.phy.data_width
         # Stream Endpoint.
@@ -456,7 +458,9 @@ class LitePCIeDMAWriter(LiteXModule):
         self.comb += self.sink.connect(self.data_conv.sink)
 
         # Data FIFO --------------------------------------------------------------------------------
-        data_fifo_depth = 4*max_words_per_request
+        # Default depth buffers several full Write Requests; can be increased to absorb jitter on
+        # the user stream or reduced to save BRAMs.
+        data_fifo_depth = fifo_depth if fifo_depth is not None else 4*max_words_per_request
         data_fifo = stream.SyncFIFO([("data", endpoint.phy.data_width)], data_fifo_depth, buffered=True)
         self.data_fifo = ResetInserter()(data_fifo)
         # By default, accept incoming stream when disabled.
@@ -916,8 +920,8 @@ class LitePCIeDMA(LiteXModule):
     Optional buffering, loopback, synchronization and monitoring.
     """
     def __init__(self, phy, endpoint, with_table=True, table_depth=256, address_width=32, data_width=None,
-        with_writer       = True,
-        with_reader       = True,
+        with_writer       = True, writer_fifo_depth=None,
+        with_reader       = True, reader_fifo_depth=None,
         # Loopback.
         with_loopback     = False,
         # Synchronizer.
@@ -945,6 +949,7 @@ class LitePCIeDMA(LiteXModule):
                 table_depth          = table_depth,
                 address_width        = address_width,
                 data_width           = self.data_width,
+                fifo_depth           = writer_fifo_depth,
             )
             self.comb += self.sink.connect(self.writer.sink)
 
@@ -956,6 +961,7 @@ class LitePCIeDMA(LiteXModule):
                 table_depth          = table_depth,
                 address_width        = address_width,
                 data_width           = self.data_width,
+                fifo_depth           = reader_fifo_depth,
             )
             self.comb += self.reader.source.connect(self.source)
 
@@ -157,7 +157,14 @@ class LitePCIeCRG(LiteXModule):
         # External Clk mode: Clk is provided by the User logic.
         if clk_external:
             self.comb += self.cd_sys.clk.eq(clk)
-            self.specials += AsyncResetSynchronizer(self.cd_sys, rst | pcie_rst)
+            # Register the PCIe Reset in its own domain before combining it with the User Reset:
+            # this keeps the async-assert path of the synchronizer to a single OR gate (pcie_rst_r
+            # is slow-changing and holds its reset value of 1 while the pcie domain is down).
+            pcie_rst_r = Signal(reset=1)
+            self.sync.pcie += pcie_rst_r.eq(pcie_rst)
+            async_rst = Signal()
+            self.comb += async_rst.eq(rst | pcie_rst_r)
+            self.specials += AsyncResetSynchronizer(self.cd_sys, async_rst)
 
         # Internal Clk mode: Clk is provided to the User logic by the LitePCIe standalone core.
         else:
@@ -212,10 +219,17 @@ class LitePCIeCore(SoCMini):
             self.bus.add_master(name="ctrl", master=axi)
 
         # PCIe PHY ---------------------------------------------------------------------------------
+        # With phy_cd set to "pcie", the PHY's sys<->pcie CDC FIFOs are skipped and the User logic
+        # runs directly at the native PCIe clock; this requires the internal Clk mode (sys clocked
+        # from the PCIe clock).
+        phy_cd = core_config.get("phy_cd", "sys")
+        if phy_cd == "pcie":
+            assert not clk_external
         self.pcie_phy = core_config["phy"](platform, platform.request("pcie"),
             pcie_data_width = core_config.get("phy_pcie_data_width", 64),
             data_width      = core_config["phy_data_width"],
-            bar0_size       = core_config["phy_bar0_size"])
+            bar0_size       = core_config["phy_bar0_size"],
+            cd              = phy_cd)
 
         # PCIe Endpoint ----------------------------------------------------------------------------
         self.pcie_endpoint = LitePCIeEndpoint(self.pcie_phy,
@@ -278,7 +292,7 @@ class LitePCIeCore(SoCMini):
         dmas_params = []
 
         class DMAParams:
-            def __init__(self, writer, reader, buffering, loopback, synchronizer, monitor, data_width):
+            def __init__(self, writer, reader, buffering, loopback, synchronizer, monitor, data_width, fifo_depth=None):
                 self.writer       = writer
                 self.reader       = reader
                 self.buffering    = buffering
@@ -286,6 +300,7 @@ class LitePCIeCore(SoCMini):
                 self.synchronizer = synchronizer
                 self.monitor      = monitor
                 self.data_width   = data_width
+                self.fifo_depth   = fifo_depth
 
         # DMA Channels configured separately.
         if isinstance(core_config.get("dma_channels"), dict):
@@ -299,6 +314,7 @@ class LitePCIeCore(SoCMini):
                     loopback     = params.get("dma_loopback",      True),
                     synchronizer = params.get("dma_synchronizer", False),
                     monitor      = params.get("dma_monitor",      False),
+                    fifo_depth   = params.get("dma_fifo_depth",    None),
                 )
                 dmas_params.append(dma_params)
 
@@ -313,6 +329,7 @@ class LitePCIeCore(SoCMini):
                     loopback     = core_config.get("dma_loopback",      True),
                     synchronizer = core_config.get("dma_synchronizer", False),
                     monitor      = core_config.get("dma_monitor",      False),
+                    fifo_depth   = core_config.get("dma_fifo_depth",    None),
                 )
                 dmas_params.append(dma_params)
 
@@ -329,6 +346,8 @@ class LitePCIeCore(SoCMini):
                 data_width        = dma_params.data_width,
                 with_writer       = dma_params.writer,
                 with_reader       = dma_params.reader,
+                writer_fifo_depth = dma_params.fifo_depth,
+                reader_fifo_depth = dma_params.fifo_depth,
                 with_buffering    = dma_params.buffering != 0,
                 buffering_depth   = dma_params.buffering,
                 with_loopback     = dma_params.loopback,
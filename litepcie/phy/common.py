@@ -12,33 +12,42 @@ from litepcie.common import *
 # TX Datapath --------------------------------------------------------------------------------------
 
 class PHYTXDatapath(Module):
-    def __init__(self, core_data_width, pcie_data_width, clock_domain):
-        self.sink   = sink   = stream.Endpoint(phy_layout(core_data_width))
-        self.source = source = stream.Endpoint(phy_layout(pcie_data_width))
+    def __init__(self, core_data_width, pcie_data_width, clock_domain, cdc_depth=16):
+        core_layout = phy_layout(core_data_width)
+        pcie_layout = phy_layout(pcie_data_width)
+        self.sink   = sink   = stream.Endpoint(core_layout)
+        self.source = source = stream.Endpoint(pcie_layout)
 
         # # #
 
         if (clock_domain == "pcie") and (core_data_width == pcie_data_width):
             self.comb += sink.connect(source)
         else:
-            pipe_valid = stream.PipeValid(phy_layout(core_data_width))
+            pipe_valid = stream.PipeValid(core_layout)
             pipe_valid = ClockDomainsRenamer(clock_domain)(pipe_valid)
-            cdc        = stream.ClockDomainCrossing(
-                layout          = phy_layout(core_data_width),
-                cd_from         = clock_domain,
-                cd_to           = "pcie",
-                with_common_rst = True,
-                depth           = 16,
-            )
-            converter  = stream.StrideConverter(phy_layout(core_data_width), phy_layout(pcie_data_width))
+            converter  = stream.StrideConverter(core_layout, pcie_layout)
             converter  = ClockDomainsRenamer("pcie")(converter)
-            pipe_ready = stream.PipeReady(phy_layout(pcie_data_width))
+            pipe_ready = stream.PipeReady(pcie_layout)
             pipe_ready = ClockDomainsRenamer("pcie")(pipe_ready)
-            self.submodules += pipe_valid, cdc, converter, pipe_ready
+            self.submodules += pipe_valid, converter, pipe_ready
+            if clock_domain == "pcie":
+                # Data Width Conversion only (already in pcie domain, no CDC required).
+                self.comb += pipe_valid.source.connect(converter.sink)
+            else:
+                cdc = stream.ClockDomainCrossing(
+                    layout          = core_layout,
+                    cd_from         = clock_domain,
+                    cd_to           = "pcie",
+                    with_common_rst = True,
+                    depth           = cdc_depth,
+                )
+                self.submodules += cdc
+                self.comb += [
+                    pipe_valid.source.connect(cdc.sink),
+                    cdc.source.connect(converter.sink),
+                ]
             self.comb += [
                 sink.connect(pipe_valid.sink),
-                pipe_valid.source.connect(cdc.sink),
-                cdc.source.connect(converter.sink),
                 converter.source.connect(pipe_ready.sink),
                 pipe_ready.source.connect(source),
             ]
@@ -89,9 +98,11 @@ class PHYRX128BAligner(Module):
 # RX Datapath --------------------------------------------------------------------------------------
 
 class PHYRXDatapath(Module):
-    def __init__(self, core_data_width, pcie_data_width, clock_domain, with_aligner=False):
-        self.sink   = sink   = stream.Endpoint(phy_layout(pcie_data_width))
-        self.source = source = stream.Endpoint(phy_layout(core_data_width))
+    def __init__(self, core_data_width, pcie_data_width, clock_domain, with_aligner=False, cdc_depth=16):
+        core_layout = phy_layout(core_data_width)
+        pcie_layout = phy_layout(pcie_data_width)
+        self.sink   = sink   = stream.Endpoint(pcie_layout)
+        self.source = source = stream.Endpoint(core_layout)
 
         # # #
 
@@ -105,25 +116,32 @@ class PHYRXDatapath(Module):
         if (clock_domain == "pcie") and (core_data_width == pcie_data_width):
             self.comb += sink.connect(source)
         else:
-            pipe_ready = stream.PipeReady(phy_layout(core_data_width))
+            pipe_ready = stream.PipeReady(core_layout)
             pipe_ready = ClockDomainsRenamer("pcie")(pipe_ready)
-            converter  = stream.StrideConverter(phy_layout(pcie_data_width), phy_layout(core_data_width))
+            converter  = stream.StrideConverter(pcie_layout, core_layout)
             converter  = ClockDomainsRenamer("pcie")(converter)
-            cdc        = stream.ClockDomainCrossing(
-                layout          = phy_layout(core_data_width),
-                cd_from         = "pcie",
-                cd_to           = clock_domain,
-                with_common_rst = True,
-                depth           = 16,
-            )
-            pipe_valid = stream.PipeValid(phy_layout(core_data_width))
+            pipe_valid = stream.PipeValid(core_layout)
             pipe_valid = ClockDomainsRenamer(clock_domain)(pipe_valid)
-            self.submodules += pipe_ready, converter, cdc, pipe_valid
+            self.submodules += pipe_ready, converter, pipe_valid
+            if clock_domain == "pcie":
+                # Data Width Conversion only (already in pcie domain, no CDC required).
+                self.comb += converter.source.connect(pipe_valid.sink)
+            else:
+                cdc = stream.ClockDomainCrossing(
+                    layout          = core_layout,
+                    cd_from         = "pcie",
+                    cd_to           = clock_domain,
+                    with_common_rst = True,
+                    depth           = cdc_depth,
+                )
+                self.submodules += cdc
+                self.comb += [
+                    converter.source.connect(cdc.sink),
+                    cdc.source.connect(pipe_valid.sink),
+                ]
             self.comb += [
                 sink.connect(pipe_ready.sink),
                 pipe_ready.source.connect(converter.sink),
-                converter.source.connect(cdc.sink),
-                cdc.source.connect(pipe_valid.sink),
                 pipe_valid.source.connect(source),
             ]
 
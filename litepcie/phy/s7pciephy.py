@@ -5,9 +5,10 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 import os
+import types
 
 from migen import *
-from migen.genlib.cdc import MultiReg
+from migen.genlib.cdc import MultiReg, BusSynchronizer
 
 from litex.gen import *
 
@@ -17,6 +18,135 @@ from litex.soc.cores.clock import S7MMCM
 from litepcie.common import *
 from litepcie.phy.common import *
 
+# Constants ----------------------------------------------------------------------------------------
+
+# Supported configurations.
+_valid_nlanes          = frozenset({1, 2, 4, 8})
+_valid_data_widths     = frozenset({64, 128})
+
+# Supported RefClk frequencies and associated periods (ns).
+_refclk_periods = {
+    100e6 : 10.0,
+    125e6 :  8.0,
+    250e6 :  4.0,
+}
+
+# Unused Hard IP error reporting inputs (tied-off).
+_cfg_err_ports = (
+    "ecrc",
+    "ur",
+    "cpl_timeout",
+    "cpl_unexpect",
+    "cpl_abort",
+    "posted",
+    "cor",
+    "atomic_egress_blocked",
+    "internal_cor",
+    "malformed",
+    "mc_blocked",
+    "poisoned",
+    "norecovery",
+    "tlp_cpl_header",
+    "locked",
+    "acs",
+    "internal_uncor",
+)
+
+# Unused Hard IP received message outputs (left open).
+_cfg_msg_received_ports = (
+    "pm_as_nak",
+    "setslotpowerlimit",
+    "err_cor",
+    "err_non_fatal",
+    "err_fatal",
+    "pm_pme",
+    "pme_to_ack",
+    "assert_int_a",
+    "assert_int_b",
+    "assert_int_c",
+    "assert_int_d",
+    "deassert_int_a",
+    "deassert_int_b",
+    "deassert_int_c",
+    "deassert_int_d",
+)
+
+# Unused Hard IP root port error reporting outputs (left open).
+_cfg_root_control_ports = (
+    "syserr_corr_err_en",
+    "syserr_non_fatal_err_en",
+    "syserr_fatal_err_en",
+    "pme_int_en",
+)
+_cfg_aer_rooterr_ports = (
+    "corr_err_reporting_en",
+    "non_fatal_err_reporting_en",
+    "fatal_err_reporting_en",
+    "corr_err_received",
+    "non_fatal_err_received",
+    "fatal_err_received",
+)
+
+# Constant (tied-off) Hard IP input ports, identical for every instance and shared between them.
+_pcie_hard_ip_const_ports = types.MappingProxyType({
+    # Management Interface.
+    "i_cfg_mgmt_di"             : 0,
+    "i_cfg_mgmt_byte_en"        : 0,
+    "i_cfg_mgmt_dwaddr"         : 0,
+    "i_cfg_mgmt_wr_en"          : 0,
+    "i_cfg_mgmt_rd_en"          : 0,
+    "i_cfg_mgmt_wr_readonly"    : 0,
+    "i_cfg_mgmt_wr_rw1c_as_rw"  : 0,
+
+    # Error Reporting Interface.
+    **{f"i_cfg_err_{port}" : 0 for port in _cfg_err_ports},
+
+    # AER Interface.
+    "i_cfg_err_aer_headerlog"   : 0,
+    "i_cfg_aer_interrupt_msgnum": 0,
+
+    # Power Management Interface.
+    "i_cfg_turnoff_ok"          : 0,
+    "i_cfg_trn_pending"         : 0,
+    "i_cfg_pm_halt_aspm_l0s"    : 0,
+    "i_cfg_pm_halt_aspm_l1"     : 0,
+    "i_cfg_pm_force_state_en"   : 0,
+    "i_cfg_pm_force_state"      : 0,
+    "i_cfg_dsn"                 : 0,
+    "i_cfg_pm_send_pme_to"      : 0,
+    "i_cfg_ds_bus_number"       : 0,
+    "i_cfg_ds_device_number"    : 0,
+    "i_cfg_ds_function_number"  : 0,
+    "i_cfg_pm_wake"             : 0,
+
+    # Physical Layer Interface.
+    "i_pl_directed_link_change"     : 0,
+    "i_pl_directed_link_width"      : 0,
+    "i_pl_directed_link_speed"      : 0,
+    "i_pl_directed_link_auton"      : 0,
+    "i_pl_upstream_prefer_deemph"   : 1,
+    "i_pl_transmit_hot_rst"         : 0,
+    "i_pl_downstream_deemph_source" : 0,
+
+    # PCIe DRP Interface.
+    "i_pcie_drp_clk"  : 1,
+    "i_pcie_drp_en"   : 0,
+    "i_pcie_drp_we"   : 0,
+    "i_pcie_drp_addr" : 0,
+    "i_pcie_drp_di"   : 0,
+})
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def _bar_encode(size):
+    # Encode a power-of-2 BAR size (in bytes) into the (Scale, Size) pair the pcie_7x IP expects.
+    assert size == (size & -size), "BAR size must be a power of 2"
+    for scale, unit in [("Kilobytes", 2**10), ("Megabytes", 2**20), ("Gigabytes", 2**30)]:
+        if size < (unit << 10):
+            assert size >= unit, "BAR size must be at least 1 Kilobyte"
+            return scale, size//unit
+    raise ValueError(f"Unsupported BAR size: {size} bytes")
+
 # S7PCIEPHY ----------------------------------------------------------------------------------------
 
 class S7PCIEPHY(LiteXModule):
@@ -27,8 +157,14 @@ class S7PCIEPHY(LiteXModule):
         pcie_data_width = None,
         refclk_freq     = 100e6,
         bar0_size       = 0x100000,
+        max_payload_size = None,
         msi_type        = "msi",
+        msi_vectors     = 32,
         with_ptm        = False,
+        # TX/RX Datapaths parameters.
+        cdc_depth       = 16,
+        # Vivado parameters.
+        ip_cache_dir    = None,
         # MMCM parameters.
         mmcm_clk125_buf = "bufg",
         mmcm_clk250_buf = "bufg",
@@ -69,7 +205,9 @@ class S7PCIEPHY(LiteXModule):
         self.pcie_data_width  = pcie_data_width
         self.refclk_freq      = refclk_freq
         self.msi_type         = msi_type
+        self.msi_vectors      = msi_vectors
         self.with_ptm         = with_ptm
+        self.ip_cache_dir     = ip_cache_dir
 
         self.id               = Signal(16, reset_less=True)
         self.bar0_size        = bar0_size
@@ -79,35 +217,56 @@ class S7PCIEPHY(LiteXModule):
 
         self.config           = {}
         self.external_hard_ip = False
+        self._sources_added   = False
+
+        # Optional Max Payload Size override (in bytes); default is selected in add_sources from
+        # the lane configuration. Larger payloads reduce per-TLP overhead on the DMA path.
+        if max_payload_size is not None:
+            assert max_payload_size in [128, 256, 512]
+            self.config["Max_Payload_Size"] = f"{max_payload_size}_bytes"
 
         # # #
 
         self.nlanes = nlanes = len(pads.tx_p)
 
-        assert nlanes          in [1, 2, 4, 8]
-        assert data_width      in [64, 128]
-        assert pcie_data_width in [64, 128]
-        assert refclk_freq     in [100e6, 125e6, 250e6]
+        assert nlanes          in _valid_nlanes
+        assert data_width      in _valid_data_widths
+        assert pcie_data_width in _valid_data_widths
+        assert refclk_freq     in _refclk_periods
 
         # Clocking / Reset -------------------------------------------------------------------------
-        self.pcie_refclk = pcie_refclk = Signal()
-        self.pcie_rst_n  = pcie_rst_n  = Signal(reset=1)
-        if hasattr(pads, "rst_n"):
-            self.comb += pcie_rst_n.eq(pads.rst_n)
-        self.specials += Instance("IBUFDS_GTE2",
-            i_CEB = 0,
-            i_I   = pads.clk_p,
-            i_IB  = pads.clk_n,
-            o_O   = pcie_refclk
-        )
-        platform.add_period_constraint(pads.clk_p, 1e9/refclk_freq)
+        self.pcie_rst_n = pcie_rst_n = Signal(reset=1)
+        rst_n = getattr(pads, "rst_n", None)
+        if rst_n is not None:
+            self.comb += pcie_rst_n.eq(rst_n)
+        # Buffer/constrain each refclk differential pair only once: PHYs sharing a refclk (multi-
+        # endpoint designs) reuse the first PHY's IBUFDS_GTE2 and period constraint.
+        refclk_cache = getattr(platform, "_pcie_refclk_cache", None)
+        if refclk_cache is None:
+            refclk_cache = platform._pcie_refclk_cache = {}
+        pcie_refclk = refclk_cache.get(pads.clk_p)
+        if pcie_refclk is None:
+            pcie_refclk = Signal()
+            self.specials += Instance("IBUFDS_GTE2",
+                i_CEB = 0,
+                i_I   = pads.clk_p,
+                i_IB  = pads.clk_n,
+                o_O   = pcie_refclk
+            )
+            platform.add_period_constraint(pads.clk_p, _refclk_periods[refclk_freq])
+            refclk_cache[pads.clk_p] = pcie_refclk
+        self.pcie_refclk = pcie_refclk
         self.cd_pcie = ClockDomain()
 
         # TX (FPGA --> HOST) CDC / Data Width Conversion -------------------------------------------
+        # The datapaths trade width for clock: a data_width wider than pcie_data_width lets the cd
+        # domain run slower than the PCIe clock at the same bandwidth (e.g. 128-bit sys @ 125MHz
+        # <-> 64-bit pcie @ 250MHz), relaxing timing on the User side.
         self.tx_datapath = PHYTXDatapath(
             core_data_width = data_width,
             pcie_data_width = pcie_data_width,
-            clock_domain    = cd)
+            clock_domain    = cd,
+            cdc_depth       = cdc_depth)
         self.comb += self.sink.connect(self.tx_datapath.sink)
         s_axis_tx = self.tx_datapath.source
 
@@ -116,7 +275,8 @@ class S7PCIEPHY(LiteXModule):
             core_data_width = data_width,
             pcie_data_width = pcie_data_width,
             clock_domain    = cd,
-            with_aligner    = True)
+            with_aligner    = True,
+            cdc_depth       = cdc_depth)
         m_axis_rx = self.rx_datapath.sink
         self.comb += self.rx_datapath.source.connect(self.source)
 
@@ -173,6 +333,15 @@ class S7PCIEPHY(LiteXModule):
         self.cd_userclk2 = ClockDomain()
         self.cd_pclk     = ClockDomain()
 
+        # Clk/Rst nodes (evaluated once and shared between the Hard IP ports).
+        pcie_clk = ClockSignal("pcie")
+        pcie_rst = ResetSignal("pcie")
+        pclk     = ClockSignal("pclk")
+        clk125   = ClockSignal("clk125")
+        clk250   = ClockSignal("clk250")
+        userclk1 = ClockSignal("userclk1")
+        userclk2 = ClockSignal("userclk2")
+
         # MMCM.
         userclk1_freq = {1:125e6, 2:125e6, 4:250e6, 8:500e6}[nlanes]
         userclk2_freq = {1:125e6, 2:125e6, 4:125e6, 8:250e6}[nlanes]
@@ -199,21 +368,60 @@ class S7PCIEPHY(LiteXModule):
             Instance("BUFGCTRL",
                 i_CE0 = 0b1,
                 i_CE1 = 0b1,
-                i_I0  = ClockSignal("clk125"),
-                i_I1  = ClockSignal("clk250"),
+                i_I0  = clk125,
+                i_I1  = clk250,
                 i_S0  = (pclk_sel == 0),
                 i_S1  = (pclk_sel == 1),
-                o_O   = ClockSignal("pclk"),
+                o_O   = pclk,
             )
         ]
         pclk_sel.attr.add("keep")
         platform.add_platform_command("set_false_path -through [get_nets {{*pclk_sel}}]")
 
         # Hard IP ----------------------------------------------------------------------------------
-        m_axis_rx_tlast = Signal()
-        m_axis_rx_tuser = Signal(32)
+
+        # RX First/Last delimiters: the 128-bit datapath uses the tuser sof/eof flags, the 64-bit
+        # datapath uses tlast; only allocate/wire the signals the selected configuration consumes.
+        if pcie_data_width == 128:
+            m_axis_rx_tlast = Open()
+            m_axis_rx_tuser = Signal(32)
+            rx_is_sof = m_axis_rx_tuser[10:15] # Start of a new packet header in m_axis_rx_tdata.
+            rx_is_eof = m_axis_rx_tuser[17:22] # End of a packet in m_axis_rx_tdata.
+            self.comb += [
+                m_axis_rx.first.eq(rx_is_sof[-1]),
+                m_axis_rx.last.eq( rx_is_eof[-1]),
+                If(rx_is_sof == 0b11000, self.rx_datapath.aligner.first_dword.eq(2)),
+            ]
+        else:
+            m_axis_rx_tlast = Signal()
+            m_axis_rx_tuser = Open(32)
+            self.comb += [
+                m_axis_rx.first.eq(0),
+                m_axis_rx.last.eq(m_axis_rx_tlast),
+            ]
+
+        # Link/Interrupt Status Resync (grouped in a single MultiReg per status vector).
+        link_status_pcie = Signal(10)
+        link_status_sys  = Signal(10)
+        int_enable_pcie  = Signal(2)
+        int_enable_sys   = Signal(2)
+        self.specials += [
+            MultiReg(link_status_pcie, link_status_sys, "sys", n=3),
+            MultiReg(int_enable_pcie,  int_enable_sys,  "sys", n=3),
+        ]
+        self.comb += [
+            self._link_status.fields.status.eq(link_status_sys[0]),
+            self._link_status.fields.rate.eq(  link_status_sys[1]),
+            self._link_status.fields.width.eq( link_status_sys[2:4]),
+            self._link_status.fields.ltssm.eq( link_status_sys[4:10]),
+            self._msi_enable.status.eq( int_enable_sys[0]),
+            self._msix_enable.status.eq(int_enable_sys[1]),
+        ]
 
         self.pcie_phy_params = dict(
+            # Constant (tied-off) input ports ------------------------------------------------------
+            **_pcie_hard_ip_const_ports,
+
             # PCI Express Interface ----------------------------------------------------------------
             # Clk/Rst
             i_sys_clk                                    = pcie_refclk,
@@ -228,25 +436,25 @@ class S7PCIEPHY(LiteXModule):
             i_pci_exp_rxn                                = pads.rx_n,
 
             # PIPE Clocking Interface --------------------------------------------------------------
-            i_pipe_pclk_in                               = ClockSignal("pclk"),
+            i_pipe_pclk_in                               = pclk,
             o_pipe_txoutclk_out                          = pipe_txoutclk,
             o_pipe_rxoutclk_out                          = Open(),
             o_pipe_pclk_sel_out                          = pipe_pclk_sel,
             o_pipe_gen3_out                              = Open(),
-            i_pipe_rxusrclk_in                           = ClockSignal("pclk"),
+            i_pipe_rxusrclk_in                           = pclk,
             i_pipe_rxoutclk_in                           = 0,
-            i_pipe_dclk_in                               = ClockSignal("clk125"),
-            i_pipe_userclk1_in                           = ClockSignal("userclk1"),
-            i_pipe_userclk2_in                           = ClockSignal("userclk2"),
-            i_pipe_oobclk_in                             = ClockSignal("pclk"),
+            i_pipe_dclk_in                               = clk125,
+            i_pipe_userclk1_in                           = userclk1,
+            i_pipe_userclk2_in                           = userclk2,
+            i_pipe_oobclk_in                             = pclk,
             i_pipe_mmcm_lock_in                          = mmcm.locked,
             i_pipe_mmcm_rst_n                            = 1,
 
             # AXI-S Interface ----------------------------------------------------------------------
             # Common
-            o_user_clk_out                               = ClockSignal("pcie"),
-            o_user_reset_out                             = ResetSignal("pcie"),
-            o_user_lnk_up                                = self.add_resync(self._link_status.fields.status, "sys"),
+            o_user_clk_out                               = pcie_clk,
+            o_user_reset_out                             = pcie_rst,
+            o_user_lnk_up                                = link_status_pcie[0],
             o_user_app_rdy                               = Open(),
 
             # TX
@@ -283,53 +491,15 @@ class S7PCIEPHY(LiteXModule):
             # Management Interface -----------------------------------------------------------------
             o_cfg_mgmt_do                                = Open(),
             o_cfg_mgmt_rd_wr_done                        = Open(),
-            i_cfg_mgmt_di                                = 0,
-            i_cfg_mgmt_byte_en                           = 0,
-            i_cfg_mgmt_dwaddr                            = 0,
-            i_cfg_mgmt_wr_en                             = 0,
-            i_cfg_mgmt_rd_en                             = 0,
-            i_cfg_mgmt_wr_readonly                       = 0,
-            i_cfg_mgmt_wr_rw1c_as_rw                     = 0,
 
             # Error Reporting Interface ------------------------------------------------------------
-            i_cfg_err_ecrc                               = 0,
-            i_cfg_err_ur                                 = 0,
-            i_cfg_err_cpl_timeout                        = 0,
-            i_cfg_err_cpl_unexpect                       = 0,
-            i_cfg_err_cpl_abort                          = 0,
-            i_cfg_err_posted                             = 0,
-            i_cfg_err_cor                                = 0,
-            i_cfg_err_atomic_egress_blocked              = 0,
-            i_cfg_err_internal_cor                       = 0,
-            i_cfg_err_malformed                          = 0,
-            i_cfg_err_mc_blocked                         = 0,
-            i_cfg_err_poisoned                           = 0,
-            i_cfg_err_norecovery                         = 0,
-            i_cfg_err_tlp_cpl_header                     = 0,
             o_cfg_err_cpl_rdy                            = Open(),
-            i_cfg_err_locked                             = 0,
-            i_cfg_err_acs                                = 0,
-            i_cfg_err_internal_uncor                     = 0,
 
             # AER interface ------------------------------------------------------------------------
-            i_cfg_err_aer_headerlog                      = 0,
-            i_cfg_aer_interrupt_msgnum                   = 0,
             o_cfg_err_aer_headerlog_set                  = Open(),
             o_cfg_aer_ecrc_check_en                      = Open(),
             o_cfg_aer_ecrc_gen_en                        = Open(),
 
-            i_cfg_turnoff_ok                             = 0,
-            i_cfg_trn_pending                            = 0,
-            i_cfg_pm_halt_aspm_l0s                       = 0,
-            i_cfg_pm_halt_aspm_l1                        = 0,
-            i_cfg_pm_force_state_en                      = 0,
-            i_cfg_pm_force_state                         = 0,
-            i_cfg_dsn                                    = 0,
-            i_cfg_pm_send_pme_to                         = 0,
-            i_cfg_ds_bus_number                          = 0,
-            i_cfg_ds_device_number                       = 0,
-            i_cfg_ds_function_number                     = 0,
-            i_cfg_pm_wake                                = 0,
 
             # Interrupt Interface ------------------------------------------------------------------
             i_cfg_interrupt                              = cfg_msi.valid,
@@ -338,17 +508,17 @@ class S7PCIEPHY(LiteXModule):
             i_cfg_interrupt_di                           = cfg_msi.dat,
             o_cfg_interrupt_do                           = Open(),
             o_cfg_interrupt_mmenable                     = Open(),
-            o_cfg_interrupt_msienable                    = self.add_resync(self._msi_enable.status,  "sys"),
-            o_cfg_interrupt_msixenable                   = self.add_resync(self._msix_enable.status, "sys"),
+            o_cfg_interrupt_msienable                    = int_enable_pcie[0],
+            o_cfg_interrupt_msixenable                   = int_enable_pcie[1],
             o_cfg_interrupt_msixfm                       = Open(),
             i_cfg_interrupt_stat                         = 0,
             i_cfg_pciecap_interrupt_msgnum               = 0,
 
             # Configuration Interface --------------------------------------------------------------
             o_cfg_status                                 = Open(),
-            o_cfg_command                                = self.add_resync(command, "sys"),
+            o_cfg_command                                = self.add_resync(command, "sys", mode="bus"),
             o_cfg_dstatus                                = Open(),
-            o_cfg_dcommand                               = self.add_resync(dcommand, "sys"),
+            o_cfg_dcommand                               = self.add_resync(dcommand, "sys", mode="bus"),
             o_cfg_lstatus                                = Open(),
             o_cfg_lcommand                               = Open(),
             o_cfg_dcommand2                              = Open(),
@@ -364,48 +534,21 @@ class S7PCIEPHY(LiteXModule):
             o_cfg_received_func_lvl_rst                  = Open(),
             o_cfg_bridge_serr_en                         = Open(),
             o_cfg_slot_control_electromech_il_ctl_pulse  = Open(),
-            o_cfg_root_control_syserr_corr_err_en        = Open(),
-            o_cfg_root_control_syserr_non_fatal_err_en   = Open(),
-            o_cfg_root_control_syserr_fatal_err_en       = Open(),
-            o_cfg_root_control_pme_int_en                = Open(),
-            o_cfg_aer_rooterr_corr_err_reporting_en      = Open(),
-            o_cfg_aer_rooterr_non_fatal_err_reporting_en = Open(),
-            o_cfg_aer_rooterr_fatal_err_reporting_en     = Open(),
-            o_cfg_aer_rooterr_corr_err_received          = Open(),
-            o_cfg_aer_rooterr_non_fatal_err_received     = Open(),
-            o_cfg_aer_rooterr_fatal_err_received         = Open(),
+            **{f"o_cfg_root_control_{port}" : Open() for port in _cfg_root_control_ports},
+            **{f"o_cfg_aer_rooterr_{port}"  : Open() for port in _cfg_aer_rooterr_ports},
 
             # VC Interface -------------------------------------------------------------------------
             o_cfg_vc_tcvc_map                            = Open(),
 
             o_cfg_msg_received                           = Open(),
             o_cfg_msg_data                               = Open(),
-            o_cfg_msg_received_pm_as_nak                 = Open(),
-            o_cfg_msg_received_setslotpowerlimit         = Open(),
-            o_cfg_msg_received_err_cor                   = Open(),
-            o_cfg_msg_received_err_non_fatal             = Open(),
-            o_cfg_msg_received_err_fatal                 = Open(),
-            o_cfg_msg_received_pm_pme                    = Open(),
-            o_cfg_msg_received_pme_to_ack                = Open(),
-            o_cfg_msg_received_assert_int_a              = Open(),
-            o_cfg_msg_received_assert_int_b              = Open(),
-            o_cfg_msg_received_assert_int_c              = Open(),
-            o_cfg_msg_received_assert_int_d              = Open(),
-            o_cfg_msg_received_deassert_int_a            = Open(),
-            o_cfg_msg_received_deassert_int_b            = Open(),
-            o_cfg_msg_received_deassert_int_c            = Open(),
-            o_cfg_msg_received_deassert_int_d            = Open(),
+            **{f"o_cfg_msg_received_{port}" : Open() for port in _cfg_msg_received_ports},
 
 
             # Physical Layer Interface -------------------------------------------------------------
-            i_pl_directed_link_change                    = 0,
-            i_pl_directed_link_width                     = 0,
-            i_pl_directed_link_speed                     = 0,
-            i_pl_directed_link_auton                     = 0,
-            i_pl_upstream_prefer_deemph                  = 1,
-            o_pl_sel_lnk_rate                            = self.add_resync(self._link_status.fields.rate,  "sys"),
-            o_pl_sel_lnk_width                           = self.add_resync(self._link_status.fields.width, "sys"),
-            o_pl_ltssm_state                             = self.add_resync(self._link_status.fields.ltssm, "sys"),
+            o_pl_sel_lnk_rate                            = link_status_pcie[1],
+            o_pl_sel_lnk_width                           = link_status_pcie[2:4],
+            o_pl_ltssm_state                             = link_status_pcie[4:10],
             o_pl_lane_reversal_mode                      = Open(),
             o_pl_phy_lnk_up                              = Open(),
             o_pl_tx_pm_state                             = Open(),
@@ -416,36 +559,28 @@ class S7PCIEPHY(LiteXModule):
             o_pl_initial_link_width                      = Open(),
             o_pl_directed_change_done                    = Open(),
             o_pl_received_hot_rst                        = Open(),
-            i_pl_transmit_hot_rst                        = 0,
-            i_pl_downstream_deemph_source                = 0,
 
             # PCIe DRP Interface -------------------------------------------------------------------
-            i_pcie_drp_clk                               = 1,
-            i_pcie_drp_en                                = 0,
-            i_pcie_drp_we                                = 0,
-            i_pcie_drp_addr                              = 0,
-            i_pcie_drp_di                                = 0,
             o_pcie_drp_rdy                               = Open(),
             o_pcie_drp_do                                = Open(),
         )
-        if pcie_data_width == 128:
-            rx_is_sof = m_axis_rx_tuser[10:15] # Start of a new packet header in m_axis_rx_tdata.
-            rx_is_eof = m_axis_rx_tuser[17:22] # End of a packet in m_axis_rx_tdata.
-            self.comb += [
-                m_axis_rx.first.eq(rx_is_sof[-1]),
-                m_axis_rx.last.eq( rx_is_eof[-1]),
-                If(rx_is_sof == 0b11000, self.rx_datapath.aligner.first_dword.eq(2)),
-            ]
-        else:
-            self.comb += [
-                m_axis_rx.first.eq(0),
-                m_axis_rx.last.eq(m_axis_rx_tlast),
-            ]
 
     # Resync Helper --------------------------------------------------------------------------------
-    def add_resync(self, sig, clk="sys"):
+    def add_resync(self, sig, clk="sys", n=3, mode="level"):
+        # mode="level": n-FF MultiReg; 3 stages by default, improving MTBF over the 2 FF default for
+        # these slow-changing status signals at no meaningful latency cost. MultiReg already tags
+        # the chain with no_retiming/async_reg so the synthesizer's optimizer leaves it alone. Each
+        # bit crosses independently, so only use it where transiently inconsistent bits are harmless.
+        # mode="bus": handshaked BusSynchronizer; samples all bits coherently, for multi-bit values
+        # that are decoded as a whole. Output holds its reset value while the pcie domain is down.
+        assert mode in ["level", "bus"]
         _sig = Signal.like(sig)
-        self.specials += MultiReg(_sig, sig, clk)
+        if mode == "bus":
+            bus_sync = BusSynchronizer(len(sig), "pcie", clk)
+            self.submodules += bus_sync
+            self.comb += [bus_sync.i.eq(_sig), sig.eq(bus_sync.o)]
+        else:
+            self.specials += MultiReg(_sig, sig, clk, n=n)
         return _sig
 
     # LTSSM Tracer ---------------------------------------------------------------------------------
@@ -482,74 +617,94 @@ class S7PCIEPHY(LiteXModule):
     def update_config(self, config):
         self.config.update(config)
 
+    def _build_config(self):
+        # Return the pcie_7x IP configuration dict for the current PHY parameters; user/custom
+        # entries from self.config take precedence.
+        # Global parameters.
+        bar0_scale, bar0_size = _bar_encode(self.bar0_size)
+        is_x8 = (self.nlanes == 8)
+        config = {
+            "Bar0_Scale"         : bar0_scale,
+            "Bar0_Size"          : bar0_size,
+            "Buf_Opt_BMA"        : True,
+            "Component_Name"     : "pcie",
+            "Device_ID"          : 7020 + self.nlanes,
+            "Interface_Width"    : f"{self.pcie_data_width}_bit",
+            "Link_Speed"         : "5.0_GT/s",
+            "Max_Payload_Size"   : "256_bytes" if is_x8 else "512_bytes",
+            "Maximum_Link_Width" : f"X{self.nlanes}",
+            "PCIe_Blk_Locn"      : "X0Y0",
+            "Ref_Clk_Freq"       : f"{int(self.refclk_freq/1e6)}_MHz",
+            "Trans_Buf_Pipeline" : None,
+            "Trgt_Link_Speed"    : "4'h2",
+            "User_Clk_Freq"      : 250 if is_x8 else 125,
+        }
+
+        # Interrupts parameters.
+        assert self.msi_type in ["msi", "msi-multi-vector", "msi-x"]
+        config.update({
+                "Legacy_Interrupt" : None,
+                "IntX_Generation"  : False,
+        })
+        if self.msi_type == "msi":
+            config.update({
+                "MSI_64b"                  : False,
+                "Multiple_Message_Capable" : "1_vector",
+            })
+        if self.msi_type == "msi-multi-vector":
+            assert self.msi_vectors in [1, 2, 4, 8, 16, 32]
+            config.update({
+                "MSI_64b"                  : False,
+                "Multiple_Message_Capable" : {1: "1_vector"}.get(self.msi_vectors, f"{self.msi_vectors}_vectors"),
+            })
+        if self.msi_type == "msi-x":
+            config.update({
+                "mode_selection"    : "Advanced",
+                "MSI_Enabled"       : False,
+                "MSIx_Enabled"      : True,
+                "MSIx_Table_Size"   : "20",   # Hexa.
+                "MSIx_Table_Offset" : "2000", # Hexa, should match CSR_PCIE_MSI_TABLE_BASE.
+                "MSIx_PBA_Offset"   : "1808", # Hexa, should match CSR_PCIE_MSI_PBA_ADDR.
+            })
+
+        # Extended Capabilities Registers.
+        if self.with_ptm:
+            config.update({
+                "EXT_PCI_CFG_Space"      : True,
+                "EXT_PCI_CFG_Space_Addr" : "6B", # 0x1AC.
+            })
+
+        # User/Custom Config.
+        config.update(self.config)
+
+        return config
+
+    def _emit_ip_tcl(self, config):
+        # Tcl commands generating/synthesizing the pcie_7x IP.
+        ip_tcl = []
+        # Optional Vivado IP cache: skips re-synthesizing the Hard IP when its config is
+        # unchanged between builds (Vivado keys the cache on the IP configuration itself).
+        if self.ip_cache_dir is not None:
+            ip_tcl.append("config_ip_cache -use_cache_location {}".format(self.ip_cache_dir))
+        # -force: don't abort when a stale build directory already contains the IP.
+        ip_tcl.append("create_ip -force -vendor xilinx.com -name pcie_7x -module_name pcie_s7")
+        ip_tcl.append("set obj [get_ips pcie_s7]")
+        ip_tcl.append("set_property -dict [list \\")
+        ip_tcl += [f"CONFIG.{name} {{{{{value}}}}} \\" for name, value in config.items()]
+        ip_tcl.append("] $obj")
+        ip_tcl.append("synth_ip $obj")
+        return ip_tcl
+
     def add_sources(self, platform, phy_path, phy_filename=None, user_config=None):
+        # Guard against double emission (e.g. use_external_hard_ip followed by finalization, or
+        # re-entrant finalize flows): a duplicated create_ip block aborts the Vivado build.
+        if self._sources_added:
+            return
+        self._sources_added = True
         if phy_filename is not None:
             platform.add_ip(os.path.join(phy_path, phy_filename))
         else:
-            # Global parameters.
-            config = {
-                "Bar0_Scale"         : "Megabytes",
-                "Bar0_Size"          : 1,
-                "Buf_Opt_BMA"        : True,
-                "Component_Name"     : "pcie",
-                "Device_ID"          : 7020 + self.nlanes,
-                "Interface_Width"    : f"{self.pcie_data_width}_bit",
-                "Link_Speed"         : "5.0_GT/s",
-                "Max_Payload_Size"   : "512_bytes" if self.nlanes != 8 else "256_bytes",
-                "Maximum_Link_Width" : f"X{self.nlanes}",
-                "PCIe_Blk_Locn"      : "X0Y0",
-                "Ref_Clk_Freq"       : f"{int(self.refclk_freq/1e6)}_MHz",
-                "Trans_Buf_Pipeline" : None,
-                "Trgt_Link_Speed"    : "4'h2",
-                "User_Clk_Freq"      : 125 if self.nlanes != 8 else 250,
-            }
-
-            # Interrupts parameters.
-            assert self.msi_type in ["msi", "msi-multi-vector", "msi-x"]
-            config.update({
-                    "Legacy_Interrupt" : None,
-                    "IntX_Generation"  : False,
-            })
-            if self.msi_type == "msi":
-                config.update({
-                    "MSI_64b"                  : False,
-                    "Multiple_Message_Capable" : "1_vector",
-                })
-            if self.msi_type == "msi-multi-vector":
-                config.update({
-                    "MSI_64b"                  : False,
-                    "Multiple_Message_Capable" : "1_vector", # FIXME.
-                })
-            if self.msi_type == "msi-x":
-                config.update({
-                    "mode_selection"    : "Advanced",
-                    "MSI_Enabled"       : False,
-                    "MSIx_Enabled"      : True,
-                    "MSIx_Table_Size"   : "20",   # Hexa.
-                    "MSIx_Table_Offset" : "2000", # Hexa, should match CSR_PCIE_MSI_TABLE_BASE.
-                    "MSIx_PBA_Offset"   : "1808", # Hexa, should match CSR_PCIE_MSI_PBA_ADDR.
-                })
-
-            # Extended Capabilities Registers.
-            if self.with_ptm:
-                config.update({
-                    "EXT_PCI_CFG_Space"      : True,
-                    "EXT_PCI_CFG_Space_Addr" : "6B", # 0x1AC.
-                })
-
-            # User/Custom Config.
-            config.update(self.config)
-
-            # Tcl generation.
-            ip_tcl = []
-            ip_tcl.append("create_ip -vendor xilinx.com -name pcie_7x -module_name pcie_s7")
-            ip_tcl.append("set obj [get_ips pcie_s7]")
-            ip_tcl.append("set_property -dict [list \\")
-            for config, value in config.items():
-                ip_tcl.append("CONFIG.{} {} \\".format(config, '{{' + str(value) + '}}'))
-            ip_tcl.append(f"] $obj")
-            ip_tcl.append("synth_ip $obj")
-            platform.toolchain.pre_synthesis_commands += ip_tcl
+            platform.toolchain.pre_synthesis_commands += self._emit_ip_tcl(self._build_config())
 
         # Reset LOC constraints on GTPE2_COMMON and BRAM36 from .xci (we only want to keep Timing constraints).
         if "en_ext_gt_common" not in self.config.keys():
@@ -573,3 +728,6 @@ class S7PCIEPHY(LiteXModule):
                 phy_path     = os.path.join(os.path.abspath(os.path.dirname(__file__)), phy_path),
             )
         self.specials += Instance("pcie_s7", **self.pcie_phy_params)
+        # The ports dict is only mutable up to finalization (see use_external_qpll); release it once
+        # the Instance is emitted.
+        self.pcie_phy_params = {}
@@ -4,6 +4,8 @@
 # Copyright (c) 2015-2023 Florent Kermarrec <florent@enjoy-digital.fr>
 # SPDX-License-Identifier: BSD-2-Clause
 
+from functools import lru_cache
+
 from migen import *
 
 from litepcie.common import *
@@ -227,6 +229,11 @@ def dword_endianness_swap(src, dst, data_width, endianness, mode="dat", ndwords=
 
 # Layouts ------------------------------------------------------------------------------------------
 
+# The cached factories below return a *shared* EndpointDescription per data_width: treat it as
+# read-only. In particular, don't pass it to stream.Pack/Unpack, which reassign payload_layout on
+# the description they are given and would corrupt it for every later caller.
+
+@lru_cache(maxsize=None)
 def tlp_raw_layout(data_width):
     """
     Generate a raw TLP endpoint description.
@@ -246,6 +253,7 @@ def tlp_raw_layout(data_width):
     return EndpointDescription(layout)
 
 
+@lru_cache(maxsize=None)
 def tlp_common_layout(data_width):
     """
     Generate a common TLP endpoint description.
@@ -263,6 +271,7 @@ def tlp_common_layout(data_width):
     return EndpointDescription(layout)
 
 
+@lru_cache(maxsize=None)
 def tlp_configuration_layout(data_width):
     """
     Generate a configuration TLP endpoint description.
@@ -280,6 +289,7 @@ def tlp_configuration_layout(data_width):
     return EndpointDescription(layout)
 
 
+@lru_cache(maxsize=None)
 def tlp_request_layout(data_width):
     """
     Generate a request TLP endpoint description.
@@ -297,6 +307,7 @@ def tlp_request_layout(data_width):
     return EndpointDescription(layout)
 
 
+@lru_cache(maxsize=None)
 def tlp_completion_layout(data_width):
     """
     Generate a completion TLP endpoint description.
@@ -313,6 +324,7 @@ def tlp_completion_layout(data_width):
     ]
     return EndpointDescription(layout)
 
+@lru_cache(maxsize=None)
 def tlp_ptm_layout(data_width):
     """
     Generate a PTM TLP endpoint description.
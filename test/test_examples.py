@@ -40,3 +40,7 @@ class TestExamples(unittest.TestCase):
     def test_ac701_gen(self):
         errors = self.gen_test("ac701")
         self.assertEqual(errors, 0)
+
+    def test_ac701_pcie_cd_gen(self):
+        errors = self.gen_test("ac701_pcie_cd")
+        self.assertEqual(errors, 0)